@@ -0,0 +1,89 @@
+"""
+Utilitários internos compartilhados entre os módulos do pipeline
+(I/O de JSON e de stems, estatísticas de amplitude)
+"""
+
+import json
+from typing import Dict
+import numpy as np
+import soundfile as sf
+from numba import njit, prange
+
+# orjson é opcional: serialização bem mais rápida em batches grandes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Amplitude acima da qual um sample é considerado clippado
+CLIP_THRESHOLD = 0.99
+
+# Stems são intermediários: float 32 bits evita a quantização para PCM_16
+# (e o clipping de amostras > 1.0) a cada gravação
+STEM_SUBTYPE = 'FLOAT'
+
+
+def write_json(data: Dict, path: str):
+    """Salva dicionário em JSON (orjson se disponível, senão json padrão)"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(
+                data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            ))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_stem(path: str, y: np.ndarray, sr: int) -> None:
+    """Grava um stem como WAV float 32 bits"""
+    sf.write(path, np.asarray(y, dtype=np.float32), sr, subtype=STEM_SUBTYPE)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def fused_stats(y, frame_length, hop_length, thr):
+    """
+    Pico, RMS por frame e contagem de clipping em uma única passada sobre y
+
+    Os frames seguem librosa.feature.rms (center=True, padding com zeros).
+    Requer frame_length múltiplo de 2 * hop_length.
+    """
+    n = y.shape[0]
+    n_blocks = (n + hop_length - 1) // hop_length
+
+    # Passada única: soma de quadrados por bloco de hop + pico + clipping
+    block_sumsq = np.zeros(n_blocks)
+    peak = 0.0
+    clipped = 0
+    for b in prange(n_blocks):
+        start = b * hop_length
+        stop = min(start + hop_length, n)
+        acc = 0.0
+        block_peak = 0.0
+        block_clipped = 0
+        for i in range(start, stop):
+            v = y[i]
+            a = abs(v)
+            acc += v * v
+            block_peak = max(block_peak, a)
+            if a > thr:
+                block_clipped += 1
+        block_sumsq[b] = acc
+        peak = max(peak, block_peak)
+        clipped += block_clipped
+
+    # Cada frame centralizado cobre frame_length // hop_length blocos
+    n_frames = 1 + n // hop_length
+    blocks_per_frame = frame_length // hop_length
+    half = blocks_per_frame // 2
+    rms = np.empty(n_frames)
+    for f in prange(n_frames):
+        acc = 0.0
+        for k in range(f - half, f - half + blocks_per_frame):
+            if k >= 0 and k < n_blocks:
+                acc += block_sumsq[k]
+        rms[f] = np.sqrt(acc / frame_length)
+
+    return peak, rms, clipped
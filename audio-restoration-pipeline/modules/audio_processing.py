@@ -6,11 +6,45 @@ Inclui redução de ruído, compressão, EQ, limitação e masterização
 import numpy as np
 import librosa
 import scipy.signal as signal
+from functools import lru_cache
 from typing import Tuple, Optional, Dict
 import warnings
 
 warnings.filterwarnings('ignore')
 
+# Bandas de EQ padrão: freq_low, freq_high, Q
+_EQ_BANDS = {
+    'sub_bass': (20, 60, 2),
+    'bass': (60, 250, 2),
+    'low_mid': (250, 500, 1.5),
+    'mid': (500, 2000, 1),
+    'high_mid': (2000, 4000, 1.5),
+    'presence': (4000, 6000, 2),
+    'treble': (6000, 20000, 2)
+}
+
+
+@lru_cache(maxsize=64)
+def _build_eq_curve(eq_key: Tuple[Tuple[str, float], ...], sr: int, n_fft: int) -> np.ndarray:
+    """Curva de ganho combinada (produto das bells peaking) para um EQ"""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    curve = np.ones_like(freqs)
+
+    for band_name, gain_db in eq_key:
+        low, high, Q = _EQ_BANDS[band_name]
+        center_freq = np.sqrt(low * high)
+        gain_linear = 10 ** (gain_db / 20)
+
+        # Bell curve
+        bandwidth = center_freq / Q
+        curve *= 1 + (gain_linear - 1) * np.exp(
+            -((freqs - center_freq) ** 2) / (2 * (bandwidth / 2) ** 2)
+        )
+
+    curve = curve.astype(np.float32)
+    curve.setflags(write=False)  # Compartilhada entre chamadas
+    return curve
+
 
 class AudioProcessor:
     """Processador de áudio com ferramentas profissionais"""
@@ -34,15 +68,20 @@ class AudioProcessor:
         """
         Reduz ruído do áudio usando espectral gating melhorado
 
+        Contrato de dtype: todo o processamento é feito em float32 (STFT em
+        complex64); a entrada é convertida se necessário e a saída é float32.
+
         Args:
-            y: Sinal de áudio
+            y: Sinal de áudio (float32)
             sr: Sample rate
             noise_profile: Perfil de ruído (None = auto-detect)
             reduction_strength: Força da redução (0-1, recomendado: 0.3-0.6)
 
         Returns:
-            Áudio com ruído reduzido
+            Áudio com ruído reduzido (float32)
         """
+        y = y.astype(np.float32, copy=False)
+
         # IMPORTANTE: Se reduction_strength for 0, pular processamento
         if reduction_strength <= 0.0:
             return y
@@ -50,7 +89,7 @@ class AudioProcessor:
         # STFT com parâmetros otimizados
         n_fft = 2048
         hop_length = 512
-        D = librosa.stft(y, n_fft=n_fft, hop_length=hop_length)
+        D = librosa.stft(y, n_fft=n_fft, hop_length=hop_length, dtype=np.complex64)
         magnitude, phase = np.abs(D), np.angle(D)
 
         # Se não tiver perfil de ruído, estimar dos frames mais silenciosos
@@ -96,7 +135,7 @@ class AudioProcessor:
         mix_ratio = reduction_strength * 0.7  # Máximo 70% de wet
         y_cleaned = y_cleaned * mix_ratio + y * (1 - mix_ratio)
 
-        return y_cleaned
+        return y_cleaned.astype(np.float32, copy=False)
 
     def remove_clicks_and_pops(
         self,
@@ -215,6 +254,9 @@ class AudioProcessor:
         """
         Aplica equalização paramétrica
 
+        Todas as bandas são combinadas em uma única curva de ganho (cacheada
+        por ganhos + sample rate) e aplicadas em uma só passada de STFT.
+
         Args:
             y: Sinal de áudio
             sr: Sample rate
@@ -224,73 +266,22 @@ class AudioProcessor:
         Returns:
             Áudio equalizado
         """
-        # Definir bandas de frequência padrão
-        band_definitions = {
-            'sub_bass': (20, 60, 2),      # freq_low, freq_high, Q
-            'bass': (60, 250, 2),
-            'low_mid': (250, 500, 1.5),
-            'mid': (500, 2000, 1),
-            'high_mid': (2000, 4000, 1.5),
-            'presence': (4000, 6000, 2),
-            'treble': (6000, 20000, 2)
-        }
-
-        result = y.copy()
-
-        # Aplicar cada banda
-        for band_name, gain_db in eq_bands.items():
-            if band_name not in band_definitions:
-                continue
-
-            low, high, Q = band_definitions[band_name]
+        # Só aplicar bandas conhecidas com ganho significativo
+        eq_key = tuple(sorted(
+            (band_name, round(gain_db, 2))
+            for band_name, gain_db in eq_bands.items()
+            if band_name in _EQ_BANDS and abs(gain_db) > 0.1
+        ))
 
-            # Criar filtro
-            center = np.sqrt(low * high)
+        if not eq_key:
+            return y.copy()
 
-            # Aplicar boost/cut
-            if abs(gain_db) > 0.1:  # Só aplicar se ganho significativo
-                # Usar filtro peaking
-                result = self._apply_peaking_filter(result, sr, center, Q, gain_db)
+        eq_curve = _build_eq_curve(eq_key, sr, 2048)
 
-        return result
-
-    def _apply_peaking_filter(
-        self,
-        y: np.ndarray,
-        sr: int,
-        center_freq: float,
-        Q: float,
-        gain_db: float
-    ) -> np.ndarray:
-        """Aplica filtro peaking (bell) EQ"""
-
-        # Converter para STFT
+        # Aplicar curva combinada (ganho real preserva a fase)
         D = librosa.stft(y, n_fft=2048, hop_length=512)
-        magnitude, phase = np.abs(D), np.angle(D)
-
-        # Calcular ganho linear
-        gain_linear = 10 ** (gain_db / 20)
-
-        # Criar curva de ganho
-        freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
-
-        # Bell curve
-        bandwidth = center_freq / Q
-        bell_curve = 1 + (gain_linear - 1) * np.exp(
-            -((freqs - center_freq) ** 2) / (2 * (bandwidth / 2) ** 2)
-        )
-
-        # Aplicar ganho
-        magnitude_eq = magnitude * bell_curve[:, np.newaxis]
-
-        # Reconstruir
-        D_eq = magnitude_eq * np.exp(1j * phase)
-        y_eq = librosa.istft(D_eq, hop_length=512)
-
-        if len(y_eq) > len(y):
-            y_eq = y_eq[:len(y)]
-        elif len(y_eq) < len(y):
-            y_eq = np.pad(y_eq, (0, len(y) - len(y_eq)))
+        D *= eq_curve[:, np.newaxis]
+        y_eq = librosa.istft(D, hop_length=512, length=len(y))
 
         return y_eq
 
@@ -369,8 +360,8 @@ class AudioProcessor:
             gain_linear
         )
 
-        # Aplicar ganho
-        y_compressed = y * gain_interp
+        # Aplicar ganho (no dtype do sinal: float32 não é promovido a float64)
+        y_compressed = y * gain_interp.astype(y.dtype, copy=False)
 
         return y_compressed
 
@@ -210,14 +210,15 @@ class FrequencyRestorer:
             Áudio com graves realçados
         """
         # Filtro passa-baixa para extrair graves
-        sos = signal.butter(4, 200, btype='low', fs=sr, output='sos')
+        # (SOS no dtype do sinal: float32 não é promovido a float64)
+        sos = signal.butter(4, 200, btype='low', fs=sr, output='sos').astype(y.dtype, copy=False)
         bass = signal.sosfilt(sos, y)
 
         # Adicionar harmônicos
         bass_enhanced = bass * amount
 
         # Filtro passa-alta para o resto
-        sos_high = signal.butter(4, 200, btype='high', fs=sr, output='sos')
+        sos_high = signal.butter(4, 200, btype='high', fs=sr, output='sos').astype(y.dtype, copy=False)
         highs = signal.sosfilt(sos_high, y)
 
         # Combinar
@@ -4,18 +4,23 @@ Orquestra todos os módulos para processamento completo
 """
 
 import os
-import json
+import logging
 from pathlib import Path
 from typing import Dict, List, Optional
 import numpy as np
 import librosa
 import soundfile as sf
 from datetime import datetime
+from tqdm.auto import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 
 from .spectral_analysis import SpectralAnalyzer
 from .frequency_restoration import FrequencyRestorer
 from .stem_separation import StemSeparator
 from .audio_processing import AudioProcessor
+from ._utils import write_json, write_stem
+
+logger = logging.getLogger(__name__)
 
 
 class AudioRestorationPipeline:
@@ -53,7 +58,8 @@ class AudioRestorationPipeline:
         self,
         audio_path: str,
         output_name: Optional[str] = None,
-        config: Optional[Dict] = None
+        config: Optional[Dict] = None,
+        config_id: Optional[str] = None
     ) -> Dict:
         """
         Processa um arquivo de áudio completo
@@ -62,9 +68,13 @@ class AudioRestorationPipeline:
             audio_path: Caminho do arquivo de áudio
             output_name: Nome para os arquivos de saída
             config: Configurações do pipeline
+            config_id: Referência a uma configuração já salva (batch).
+                       Se informado, substitui a cópia de `config` nos resultados
 
         Returns:
-            Dicionário com resultados e caminhos
+            Dicionário com resultados e caminhos. Contém apenas metadados
+            serializáveis em JSON e caminhos de arquivos (o áudio passa entre
+            estágios via disco), então é barato de retornar de processos worker.
         """
         # Configuração padrão
         if config is None:
@@ -74,37 +84,35 @@ class AudioRestorationPipeline:
         if output_name is None:
             output_name = Path(audio_path).stem
 
-        # Criar diretório para este áudio
-        audio_output_dir = os.path.join(
-            self.output_base_dir,
-            output_name,
-            datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Criar diretório para este áudio (único mkdir; os estágios reutilizam)
+        audio_output_dir = (
+            Path(self.output_base_dir)
+            / output_name
+            / datetime.now().strftime('%Y%m%d_%H%M%S')
         )
-        os.makedirs(audio_output_dir, exist_ok=True)
+        audio_output_dir.mkdir(parents=True, exist_ok=True)
 
-        print(f"\n{'='*60}")
-        print(f"Processando: {audio_path}")
-        print(f"Output: {audio_output_dir}")
-        print(f"{'='*60}\n")
+        logger.debug("Processando: %s (output: %s)", audio_path, audio_output_dir)
 
         results = {
             'input_path': audio_path,
-            'output_dir': audio_output_dir,
+            'output_dir': str(audio_output_dir),
             'timestamp': datetime.now().isoformat(),
-            'config': config,
             'stages': {}
         }
+        if config_id is not None:
+            results['config_id'] = config_id
+        else:
+            results['config'] = config
 
         # ESTÁGIO 1: Análise
-        print("ESTÁGIO 1: Análise Espectral")
-        print("-" * 40)
+        logger.debug("ESTÁGIO 1: Análise Espectral")
         analysis = self._stage_analysis(audio_path, audio_output_dir)
         results['stages']['analysis'] = analysis
-        print(f"✓ Análise completa\n")
+        logger.debug("✓ Análise completa")
 
         # ESTÁGIO 2: Limpeza e Restauração Inicial
-        print("ESTÁGIO 2: Limpeza e Restauração Inicial")
-        print("-" * 40)
+        logger.debug("ESTÁGIO 2: Limpeza e Restauração Inicial")
         cleaned_path = self._stage_cleanup(
             audio_path,
             audio_output_dir,
@@ -112,12 +120,11 @@ class AudioRestorationPipeline:
             config
         )
         results['stages']['cleanup'] = {'output': cleaned_path}
-        print(f"✓ Limpeza completa: {Path(cleaned_path).name}\n")
+        logger.debug("✓ Limpeza completa: %s", Path(cleaned_path).name)
 
         # ESTÁGIO 3: Restauração de Frequências
         if config.get('restore_frequencies', True):
-            print("ESTÁGIO 3: Restauração de Frequências")
-            print("-" * 40)
+            logger.debug("ESTÁGIO 3: Restauração de Frequências")
             restored_path = self._stage_frequency_restoration(
                 cleaned_path,
                 audio_output_dir,
@@ -125,36 +132,34 @@ class AudioRestorationPipeline:
                 config
             )
             results['stages']['frequency_restoration'] = {'output': restored_path}
-            print(f"✓ Restauração de frequências completa: {Path(restored_path).name}\n")
+            logger.debug("✓ Restauração de frequências completa: %s", Path(restored_path).name)
         else:
             restored_path = cleaned_path
 
         # ESTÁGIO 4: Separação de Stems (opcional)
         if config.get('separate_stems', False):
-            print("ESTÁGIO 4: Separação de Stems")
-            print("-" * 40)
+            logger.debug("ESTÁGIO 4: Separação de Stems")
             stems = self._stage_stem_separation(
                 restored_path,
                 audio_output_dir,
                 config
             )
             results['stages']['stem_separation'] = stems
-            print(f"✓ Separação de stems completa\n")
+            logger.debug("✓ Separação de stems completa")
 
             # ESTÁGIO 5: Processamento Individual de Stems
             if config.get('process_stems_individually', False):
-                print("ESTÁGIO 5: Processamento Individual de Stems")
-                print("-" * 40)
+                logger.debug("ESTÁGIO 5: Processamento Individual de Stems")
                 processed_stems = self._stage_process_stems(
                     stems,
                     audio_output_dir,
                     config
                 )
                 results['stages']['processed_stems'] = processed_stems
-                print(f"✓ Processamento de stems completo\n")
+                logger.debug("✓ Processamento de stems completo")
 
                 # Reconstruir dos stems processados
-                print("Reconstruindo dos stems processados...")
+                logger.debug("Reconstruindo dos stems processados...")
                 restored_path = self._reconstruct_from_stems(
                     processed_stems,
                     audio_output_dir,
@@ -163,53 +168,50 @@ class AudioRestorationPipeline:
                 results['stages']['reconstruction'] = {'output': restored_path}
 
         # ESTÁGIO 6: Masterização
-        print("ESTÁGIO 6: Masterização")
-        print("-" * 40)
+        logger.debug("ESTÁGIO 6: Masterização")
         mastered_path = self._stage_mastering(
             restored_path,
             audio_output_dir,
             config
         )
         results['stages']['mastering'] = {'output': mastered_path}
-        print(f"✓ Masterização completa: {Path(mastered_path).name}\n")
+        logger.debug("✓ Masterização completa: %s", Path(mastered_path).name)
 
         # Salvar resultados
-        results_path = os.path.join(audio_output_dir, 'results.json')
-        with open(results_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        results_path = audio_output_dir / 'results.json'
+        write_json(results, results_path)
 
-        print(f"\n{'='*60}")
-        print(f"✓ PROCESSAMENTO COMPLETO!")
-        print(f"Arquivo final: {mastered_path}")
-        print(f"Resultados: {results_path}")
-        print(f"{'='*60}\n")
+        logger.debug("✓ Processamento completo: %s (resultados: %s)", mastered_path, results_path)
 
         return results
 
-    def _stage_analysis(self, audio_path: str, output_dir: str) -> Dict:
+    def _stage_analysis(self, audio_path: str, output_dir: Path) -> Dict:
         """Estágio de análise espectral"""
         analysis = self.analyzer.analyze_audio(audio_path)
 
         # Salvar análise
-        analysis_path = os.path.join(output_dir, 'analysis.json')
+        analysis_path = output_dir / 'analysis.json'
         self.analyzer.save_analysis(analysis, analysis_path)
 
         # Criar visualização
-        viz_path = os.path.join(output_dir, 'analysis_visualization.png')
+        viz_path = output_dir / 'analysis_visualization.png'
         self.analyzer.visualize_analysis(audio_path, viz_path)
 
+        # Áudio/STFT do analisador não são usados pelos estágios seguintes
+        self.analyzer.clear_cache()
+
         # Imprimir recomendações
         if analysis['recommendations']:
-            print("\nRecomendações:")
+            logger.debug("Recomendações:")
             for rec in analysis['recommendations']:
-                print(f"  [{rec['severity'].upper()}] {rec['message']}")
+                logger.debug("  [%s] %s", rec['severity'].upper(), rec['message'])
 
         return analysis
 
     def _stage_cleanup(
         self,
         audio_path: str,
-        output_dir: str,
+        output_dir: Path,
         analysis: Dict,
         config: Dict
     ) -> str:
@@ -218,30 +220,30 @@ class AudioRestorationPipeline:
 
         # Remover clicks/pops
         if config.get('remove_clicks', True):
-            print("  - Removendo clicks e pops...")
+            logger.debug("  - Removendo clicks e pops...")
             y = self.processor.remove_clicks_and_pops(y, sr)
 
         # Reduzir ruído
         if config.get('reduce_noise', True):
             noise_strength = config.get('noise_reduction_strength', 0.7)
-            print(f"  - Reduzindo ruído (força: {noise_strength})...")
+            logger.debug("  - Reduzindo ruído (força: %s)...", noise_strength)
             y = self.processor.reduce_noise(y, sr, reduction_strength=noise_strength)
 
         # De-clip se necessário
         if analysis['clipping_detection']['has_clipping']:
-            print("  - Corrigindo clipping...")
+            logger.debug("  - Corrigindo clipping...")
             y = self.processor.declip(y, sr)
 
         # Salvar
-        output_path = os.path.join(output_dir, '01_cleaned.wav')
+        output_path = output_dir / '01_cleaned.wav'
         sf.write(output_path, y, sr)
 
-        return output_path
+        return str(output_path)
 
     def _stage_frequency_restoration(
         self,
         audio_path: str,
-        output_dir: str,
+        output_dir: Path,
         analysis: Dict,
         config: Dict
     ) -> str:
@@ -252,38 +254,38 @@ class AudioRestorationPipeline:
         if analysis['frequency_analysis']['high_freq_loss']:
             cutoff = analysis['frequency_analysis']['high_freq_cutoff']
             method = config.get('freq_restoration_method', 'harmonic_synthesis')
-            print(f"  - Restaurando frequências altas (corte em {cutoff:.0f}Hz, método: {method})...")
+            logger.debug("  - Restaurando frequências altas (corte em %.0fHz, método: %s)...", cutoff, method)
             y = self.freq_restorer.restore_high_frequencies(y, sr, cutoff, method)
 
         # Realçar graves se configurado
         if config.get('enhance_bass', False):
             bass_amount = config.get('bass_enhancement_amount', 1.3)
-            print(f"  - Realçando graves (quantidade: {bass_amount})...")
+            logger.debug("  - Realçando graves (quantidade: %s)...", bass_amount)
             y = self.freq_restorer.enhance_bass(y, sr, bass_amount)
 
         # Aplicar melhorias psicoacústicas
         if config.get('psychoacoustic_enhancement', True):
-            print("  - Aplicando melhorias psicoacústicas...")
+            logger.debug("  - Aplicando melhorias psicoacústicas...")
             y = self.freq_restorer.apply_psychoacoustic_enhancement(y, sr)
 
         # Salvar
-        output_path = os.path.join(output_dir, '02_frequency_restored.wav')
+        output_path = output_dir / '02_frequency_restored.wav'
         sf.write(output_path, y, sr)
 
-        return output_path
+        return str(output_path)
 
     def _stage_stem_separation(
         self,
         audio_path: str,
-        output_dir: str,
+        output_dir: Path,
         config: Dict
     ) -> Dict[str, str]:
         """Estágio de separação de stems"""
-        stems_dir = os.path.join(output_dir, 'stems')
-        os.makedirs(stems_dir, exist_ok=True)
+        # separate_stems cria o diretório
+        stems_dir = str(output_dir / 'stems')
 
         model = config.get('stem_separation_model', 'basic')
-        print(f"  - Usando modelo: {model}")
+        logger.debug("  - Usando modelo: %s", model)
 
         stems = self.stem_separator.separate_stems(
             audio_path,
@@ -292,24 +294,24 @@ class AudioRestorationPipeline:
         )
 
         for stem_name, stem_path in stems.items():
-            print(f"  - {stem_name}: {Path(stem_path).name}")
+            logger.debug("  - %s: %s", stem_name, Path(stem_path).name)
 
         return stems
 
     def _stage_process_stems(
         self,
         stems: Dict[str, str],
-        output_dir: str,
+        output_dir: Path,
         config: Dict
     ) -> Dict[str, str]:
         """Estágio de processamento individual de stems"""
-        processed_dir = os.path.join(output_dir, 'stems_processed')
-        os.makedirs(processed_dir, exist_ok=True)
+        processed_dir = output_dir / 'stems_processed'
+        processed_dir.mkdir(exist_ok=True)
 
         processed_stems = {}
 
         for stem_name, stem_path in stems.items():
-            print(f"  - Processando {stem_name}...")
+            logger.debug("  - Processando %s...", stem_name)
 
             y, sr = librosa.load(stem_path, sr=self.sr)
 
@@ -337,20 +339,20 @@ class AudioRestorationPipeline:
                 y = self.freq_restorer.enhance_bass(y, sr, 1.2)
 
             # Salvar
-            output_path = os.path.join(processed_dir, f'{stem_name}_processed.wav')
-            sf.write(output_path, y, sr)
-            processed_stems[stem_name] = output_path
+            output_path = processed_dir / f'{stem_name}_processed.wav'
+            write_stem(output_path, y, sr)
+            processed_stems[stem_name] = str(output_path)
 
         return processed_stems
 
     def _reconstruct_from_stems(
         self,
         stems: Dict[str, str],
-        output_dir: str,
+        output_dir: Path,
         filename: str
     ) -> str:
         """Reconstrói áudio dos stems"""
-        output_path = os.path.join(output_dir, filename)
+        output_path = str(output_dir / filename)
 
         # Ganhos customizados (opcional)
         stem_gains = {
@@ -371,7 +373,7 @@ class AudioRestorationPipeline:
     def _stage_mastering(
         self,
         audio_path: str,
-        output_dir: str,
+        output_dir: Path,
         config: Dict
     ) -> str:
         """Estágio de masterização"""
@@ -388,7 +390,7 @@ class AudioRestorationPipeline:
         # Target LUFS
         target_lufs = config.get('target_lufs', -14.0)
 
-        print(f"  - Aplicando cadeia de masterização (target: {target_lufs} LUFS)...")
+        logger.debug("  - Aplicando cadeia de masterização (target: %s LUFS)...", target_lufs)
 
         # Aplicar masterização
         y_mastered = self.processor.master(
@@ -399,10 +401,10 @@ class AudioRestorationPipeline:
         )
 
         # Salvar
-        output_path = os.path.join(output_dir, '99_mastered_FINAL.wav')
+        output_path = output_dir / '99_mastered_FINAL.wav'
         sf.write(output_path, y_mastered, sr)
 
-        return output_path
+        return str(output_path)
 
     def _get_default_config(self) -> Dict:
         """Retorna configuração padrão do pipeline"""
@@ -445,26 +447,33 @@ class AudioRestorationPipeline:
         """
         results = []
 
-        print(f"\n{'='*60}")
-        print(f"PROCESSAMENTO EM BATCH - {len(audio_paths)} arquivos")
-        print(f"{'='*60}\n")
-
-        for i, audio_path in enumerate(audio_paths, 1):
-            print(f"\n[{i}/{len(audio_paths)}] Processando: {Path(audio_path).name}")
-
-            try:
-                result = self.process_audio(audio_path, config=config)
-                results.append(result)
-            except Exception as e:
-                print(f"✗ ERRO ao processar {audio_path}: {e}")
-                results.append({
-                    'input_path': audio_path,
-                    'error': str(e),
-                    'timestamp': datetime.now().isoformat()
-                })
-
-        print(f"\n{'='*60}")
-        print(f"BATCH COMPLETO - {len(results)} arquivos processados")
-        print(f"{'='*60}\n")
+        if config is None:
+            config = self._get_default_config()
+
+        # Salvar configuração uma única vez; cada resultado guarda só o config_id
+        config_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        config_path = Path(self.output_base_dir) / f'{config_id}_config.json'
+        write_json(config, config_path)
+
+        logger.info("PROCESSAMENTO EM BATCH - %d arquivos (configuração: %s)", len(audio_paths), config_path)
+
+        # Redirecionar logging pelo tqdm para não quebrar a barra de progresso
+        with logging_redirect_tqdm():
+            for i, audio_path in enumerate(tqdm(audio_paths, desc='Batch', unit='arquivo'), 1):
+                logger.debug("[%d/%d] Processando: %s", i, len(audio_paths), Path(audio_path).name)
+
+                try:
+                    result = self.process_audio(audio_path, config=config, config_id=config_id)
+                    results.append(result)
+                except Exception as e:
+                    logger.error("✗ ERRO ao processar %s: %s", audio_path, e)
+                    results.append({
+                        'input_path': audio_path,
+                        'error': str(e),
+                        'config_id': config_id,
+                        'timestamp': datetime.now().isoformat()
+                    })
+
+        logger.info("BATCH COMPLETO - %d arquivos processados", len(results))
 
         return results
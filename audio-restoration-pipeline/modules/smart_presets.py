@@ -3,9 +3,44 @@ Sistema de Presets Inteligentes
 Seleciona automaticamente a melhor configuração baseada na análise do áudio
 """
 
+import copy
 from typing import Dict
 import numpy as np
 
+from .stem_separation import StemSeparator
+
+
+# Configuração para áudio limpo (sem problemas detectados): apenas ajustes sutis
+_CLEAN_CONFIG = {
+    'remove_clicks': True,
+    'reduce_noise': False,
+    'noise_reduction_strength': 0.0,
+    'restore_frequencies': False,
+    'freq_restoration_method': 'harmonic_synthesis',
+    'enhance_bass': False,
+    'bass_enhancement_amount': 1.3,
+    'psychoacoustic_enhancement': True,
+    'separate_stems': False,
+    'stem_separation_model': 'basic',
+    'process_stems_individually': False,
+    'target_lufs': -14.0,
+    'master_eq': {
+        'bass': 0.0,
+        'mid': 0.0,
+        'presence': 0.5,
+        'treble': 0.3
+    },
+    'add_presence': False,
+    'advanced': {},
+    '_metadata': {
+        'quality_category': "EXCELENTE",
+        'quality_issues_count': 0,
+        'recommended_preset': "suave",
+        'analysis_reasons': [],
+        'auto_generated': True
+    }
+}
+
 
 class SmartPresetSelector:
     """Seletor inteligente de presets baseado em análise"""
@@ -13,12 +48,13 @@ class SmartPresetSelector:
     def __init__(self):
         pass
 
-    def analyze_and_suggest(self, analysis: Dict) -> Dict:
+    def analyze_and_suggest(self, analysis: Dict, build_report: bool = True) -> Dict:
         """
         Analisa áudio e sugere configuração otimizada
 
         Args:
             analysis: Resultado da análise espectral
+            build_report: Gerar as razões usadas por print_analysis_report
 
         Returns:
             Configuração otimizada baseada na análise
@@ -31,6 +67,32 @@ class SmartPresetSelector:
         high_freq_cutoff = analysis['frequency_analysis']['high_freq_cutoff']
         lufs = analysis['dynamic_range']['lufs_estimate']
         crest_factor = analysis['dynamic_range']['crest_factor']
+        band_energy = analysis['frequency_analysis']['band_energy']
+        low_energy = band_energy.get('sub_bass', 0) + band_energy.get('bass', 0)
+        mid_energy = band_energy.get('mid', 0) + band_energy.get('low_mid', 0)
+
+        # ═══════════════════════════════════════════════════════════
+        # CAMINHO RÁPIDO: ÁUDIO LIMPO (nenhum ajuste necessário)
+        # ═══════════════════════════════════════════════════════════
+        is_clean = (
+            snr >= 40
+            and not has_clipping
+            and not high_freq_loss
+            and -20 <= lufs <= -10
+            and 2 <= crest_factor <= 8
+            and low_energy >= 0.20
+            and mid_energy <= 0.45
+        )
+        if is_clean:
+            config = copy.deepcopy(_CLEAN_CONFIG)
+            if build_report:
+                config['_metadata']['analysis_reasons'] = [
+                    f"✓ Áudio limpo (SNR: {snr:.1f}dB) → Sem redução de ruído",
+                    "✓ Espectro completo → Apenas ajustes sutis",
+                    f"✓ Volume adequado ({lufs:.1f} LUFS)",
+                    f"✓ Dinâmica adequada (CF: {crest_factor:.1f})"
+                ]
+            return config
 
         # Inicializar configuração
         config = {
@@ -56,8 +118,13 @@ class SmartPresetSelector:
             'advanced': {}
         }
 
+        # Razões só são formatadas se o relatório for pedido
         reasons = []
 
+        # Demucs só é sugerido se estiver instalado; senão, separação básica
+        # (separate_stems com 'demucs' falha cedo quando falta a instalação)
+        stem_model = 'demucs' if StemSeparator.demucs_available() else 'basic'
+
         # ═══════════════════════════════════════════════════════════
         # ANÁLISE DE RUÍDO
         # ═══════════════════════════════════════════════════════════
@@ -67,22 +134,25 @@ class SmartPresetSelector:
             if snr < 15:
                 # Ruído MUITO alto
                 config['noise_reduction_strength'] = 0.85
-                reasons.append(f"🔴 Ruído MUITO alto (SNR: {snr:.1f}dB) → Redução forte (0.85)")
+                if build_report:
+                    reasons.append(f"🔴 Ruído MUITO alto (SNR: {snr:.1f}dB) → Redução forte (0.85)")
             elif snr < 25:
                 # Ruído alto
                 config['noise_reduction_strength'] = 0.75
-                reasons.append(f"🟡 Ruído alto (SNR: {snr:.1f}dB) → Redução moderada (0.75)")
+                if build_report:
+                    reasons.append(f"🟡 Ruído alto (SNR: {snr:.1f}dB) → Redução moderada (0.75)")
             else:
                 # Ruído moderado
                 config['noise_reduction_strength'] = 0.6
-                reasons.append(f"🟢 Ruído moderado (SNR: {snr:.1f}dB) → Redução suave (0.6)")
-        else:
+                if build_report:
+                    reasons.append(f"🟢 Ruído moderado (SNR: {snr:.1f}dB) → Redução suave (0.6)")
+        elif build_report:
             reasons.append(f"✓ Áudio limpo (SNR: {snr:.1f}dB) → Sem redução de ruído")
 
         # ═══════════════════════════════════════════════════════════
         # ANÁLISE DE CLIPPING
         # ═══════════════════════════════════════════════════════════
-        if has_clipping:
+        if has_clipping and build_report:
             reasons.append(f"⚠️ Clipping detectado ({clip_percentage:.2f}%) → De-clipping automático")
 
         # ═══════════════════════════════════════════════════════════
@@ -97,12 +167,14 @@ class SmartPresetSelector:
                 config['master_eq']['presence'] = 3.0
                 config['master_eq']['treble'] = 3.5
                 config['add_presence'] = True
-                reasons.append(f"🔴 Perda SEVERA de altas ({high_freq_cutoff:.0f}Hz) → Restauração agressiva")
+                if build_report:
+                    reasons.append(f"🔴 Perda SEVERA de altas ({high_freq_cutoff:.0f}Hz) → Restauração agressiva")
 
                 # Considerar separação de stems para melhor resultado
                 config['separate_stems'] = True
-                config['stem_separation_model'] = 'demucs'
-                reasons.append("→ Separação de stems recomendada para melhor restauração")
+                config['stem_separation_model'] = stem_model
+                if build_report:
+                    reasons.append("→ Separação de stems recomendada para melhor restauração")
 
             elif high_freq_cutoff < 14000:
                 # Perda moderada
@@ -110,7 +182,8 @@ class SmartPresetSelector:
                 config['master_eq']['presence'] = 2.0
                 config['master_eq']['treble'] = 2.5
                 config['add_presence'] = True
-                reasons.append(f"🟡 Perda moderada de altas ({high_freq_cutoff:.0f}Hz) → Restauração moderada")
+                if build_report:
+                    reasons.append(f"🟡 Perda moderada de altas ({high_freq_cutoff:.0f}Hz) → Restauração moderada")
 
             else:
                 # Perda leve
@@ -118,57 +191,61 @@ class SmartPresetSelector:
                 config['master_eq']['presence'] = 1.0
                 config['master_eq']['treble'] = 1.2
                 config['add_presence'] = True
-                reasons.append(f"🟢 Perda leve de altas ({high_freq_cutoff:.0f}Hz) → Restauração suave")
+                if build_report:
+                    reasons.append(f"🟢 Perda leve de altas ({high_freq_cutoff:.0f}Hz) → Restauração suave")
         else:
             config['master_eq']['presence'] = 0.5
             config['master_eq']['treble'] = 0.3
-            reasons.append("✓ Espectro completo → Apenas ajustes sutis")
+            if build_report:
+                reasons.append("✓ Espectro completo → Apenas ajustes sutis")
 
         # ═══════════════════════════════════════════════════════════
         # ANÁLISE DE VOLUME (LUFS)
         # ═══════════════════════════════════════════════════════════
-        if lufs < -30:
-            reasons.append(f"🔴 Áudio MUITO silencioso ({lufs:.1f} LUFS) → Normalização para -14 LUFS")
-        elif lufs < -20:
-            reasons.append(f"🟡 Áudio silencioso ({lufs:.1f} LUFS) → Normalização para -14 LUFS")
-        elif lufs > -10:
-            reasons.append(f"⚠️ Áudio MUITO alto ({lufs:.1f} LUFS) → Redução para -14 LUFS")
-        else:
-            reasons.append(f"✓ Volume adequado ({lufs:.1f} LUFS)")
+        if build_report:
+            if lufs < -30:
+                reasons.append(f"🔴 Áudio MUITO silencioso ({lufs:.1f} LUFS) → Normalização para -14 LUFS")
+            elif lufs < -20:
+                reasons.append(f"🟡 Áudio silencioso ({lufs:.1f} LUFS) → Normalização para -14 LUFS")
+            elif lufs > -10:
+                reasons.append(f"⚠️ Áudio MUITO alto ({lufs:.1f} LUFS) → Redução para -14 LUFS")
+            else:
+                reasons.append(f"✓ Volume adequado ({lufs:.1f} LUFS)")
 
         # ═══════════════════════════════════════════════════════════
         # ANÁLISE DE DINÂMICA
         # ═══════════════════════════════════════════════════════════
         if crest_factor < 2:
-            reasons.append(f"⚠️ Áudio muito comprimido (CF: {crest_factor:.1f}) → Sem compressão adicional")
+            if build_report:
+                reasons.append(f"⚠️ Áudio muito comprimido (CF: {crest_factor:.1f}) → Sem compressão adicional")
             config['advanced']['adaptive_compression'] = False
         elif crest_factor > 8:
-            reasons.append(f"🔴 Áudio muito dinâmico (CF: {crest_factor:.1f}) → Compressão adaptativa")
+            if build_report:
+                reasons.append(f"🔴 Áudio muito dinâmico (CF: {crest_factor:.1f}) → Compressão adaptativa")
             config['advanced']['adaptive_compression'] = True
             config['advanced']['multiband_compress'] = True
-        else:
+        elif build_report:
             reasons.append(f"✓ Dinâmica adequada (CF: {crest_factor:.1f})")
 
         # ═══════════════════════════════════════════════════════════
         # ANÁLISE DE BANDAS DE FREQUÊNCIA
         # ═══════════════════════════════════════════════════════════
-        band_energy = analysis['frequency_analysis']['band_energy']
-
         # Checar se graves estão fracos
-        low_energy = band_energy.get('sub_bass', 0) + band_energy.get('bass', 0)
         if low_energy < 0.15:  # Menos de 15% da energia
             config['enhance_bass'] = True
             config['master_eq']['bass'] = 1.5
-            reasons.append(f"🔴 Graves fracos ({low_energy*100:.1f}%) → Realce de graves")
+            if build_report:
+                reasons.append(f"🔴 Graves fracos ({low_energy*100:.1f}%) → Realce de graves")
         elif low_energy < 0.20:
             config['master_eq']['bass'] = 0.5
-            reasons.append(f"🟡 Graves moderados ({low_energy*100:.1f}%) → Leve realce")
+            if build_report:
+                reasons.append(f"🟡 Graves moderados ({low_energy*100:.1f}%) → Leve realce")
 
         # Checar se médios estão excessivos
-        mid_energy = band_energy.get('mid', 0) + band_energy.get('low_mid', 0)
         if mid_energy > 0.45:  # Mais de 45% da energia
             config['master_eq']['mid'] = -1.0
-            reasons.append(f"⚠️ Médios excessivos ({mid_energy*100:.1f}%) → Redução de médios")
+            if build_report:
+                reasons.append(f"⚠️ Médios excessivos ({mid_energy*100:.1f}%) → Redução de médios")
 
         # ═══════════════════════════════════════════════════════════
         # DECISÃO DE SEPARAÇÃO DE STEMS
@@ -183,9 +260,10 @@ class SmartPresetSelector:
         if quality_issues >= 2 and not config['separate_stems']:
             # Múltiplos problemas, separação de stems vai ajudar
             config['separate_stems'] = True
-            config['stem_separation_model'] = 'demucs'
+            config['stem_separation_model'] = stem_model
             config['process_stems_individually'] = True
-            reasons.append(f"🎯 Múltiplos problemas detectados ({quality_issues}) → Separação de stems recomendada")
+            if build_report:
+                reasons.append(f"🎯 Múltiplos problemas detectados ({quality_issues}) → Separação de stems recomendada")
 
         # ═══════════════════════════════════════════════════════════
         # PROCESSAMENTO AVANÇADO
@@ -194,7 +272,8 @@ class SmartPresetSelector:
             # Se vai usar Demucs, aproveitar para processamento avançado
             config['advanced']['de_esser'] = True  # Para vocais
             config['advanced']['stereo_enhance'] = True
-            reasons.append("→ Processamento avançado ativado (de-esser, stereo enhance)")
+            if build_report:
+                reasons.append("→ Processamento avançado ativado (de-esser, stereo enhance)")
 
         # ═══════════════════════════════════════════════════════════
         # RESUMO E CLASSIFICAÇÃO
@@ -300,7 +379,7 @@ def auto_configure(analysis: Dict, verbose: bool = True) -> Dict:
         Configuração otimizada
     """
     selector = SmartPresetSelector()
-    config = selector.analyze_and_suggest(analysis)
+    config = selector.analyze_and_suggest(analysis, build_report=verbose)
 
     if verbose:
         selector.print_analysis_report(config)
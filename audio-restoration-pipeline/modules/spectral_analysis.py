@@ -3,13 +3,101 @@ Módulo de Análise Espectral
 Analisa características espectrais do áudio para guiar o processo de restauração
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import librosa
 import librosa.display
-import matplotlib.pyplot as plt
+import soundfile as sf
+from matplotlib.figure import Figure
 from scipy import signal
+from scipy.fft import rfft, rfftfreq, next_fast_len
+from numba import njit
 from typing import Dict, Tuple, Optional
-import json
+
+from ._utils import CLIP_THRESHOLD, fused_stats, write_json
+
+
+# Arquivos maiores que isso são analisados em blocos (streaming)
+_STREAMING_MIN_BYTES = 100_000_000
+
+# Máximo de frames da STFT mantidos para estimar o noise floor no streaming
+_STREAMING_NOISE_FRAMES = 8192
+
+# Bandas de frequência analisadas: _BAND_NAMES[i] cobre [_BAND_EDGES[i], _BAND_EDGES[i + 1]) Hz
+_BAND_NAMES = ('sub_bass', 'bass', 'low_mid', 'mid', 'high_mid', 'presence', 'brilliance')
+_BAND_EDGES = np.array([20, 60, 250, 500, 2000, 4000, 6000, 20000], dtype=np.float64)
+
+
+@njit(fastmath=True, cache=True)
+def _bin_energy(mag, freqs, edges):
+    """
+    Soma mag por banda [edges[b], edges[b+1]) em uma única passada
+
+    freqs deve estar em ordem crescente; bandas vazias ficam com 0.
+    """
+    n_bands = edges.shape[0] - 1
+    energy = np.zeros(n_bands)
+    b = 0
+    for k in range(mag.shape[0]):
+        f = freqs[k]
+        if f < edges[0]:
+            continue
+        while b < n_bands and f >= edges[b + 1]:
+            b += 1
+        if b == n_bands:
+            break
+        energy[b] += mag[k]
+    return energy
+
+
+@njit(fastmath=True, cache=True)
+def _zcr(y, frame_length, hop_length, center):
+    """
+    Zero crossing rate por frame, igual a librosa.feature.zero_crossing_rate
+
+    Marca as trocas de sinal em uma única passada (|y| <= 1e-10 conta como
+    positivo) e conta por frame com soma acumulada. Com center=True o
+    padding é 'edge' (frame_length // 2 de cada lado), que não gera trocas.
+    """
+    n = y.shape[0]
+    pad = frame_length // 2 if center else 0
+    n_frames = 1 + (n + 2 * pad - frame_length) // hop_length
+
+    # crossings[i] = trocas de sinal entre os samples 0..i
+    crossings = np.empty(n, np.int64)
+    prev = y[0] < -1e-10
+    count = 0
+    crossings[0] = 0
+    for i in range(1, n):
+        cur = y[i] < -1e-10
+        count += cur ^ prev
+        crossings[i] = count
+        prev = cur
+
+    out = np.empty(n_frames)
+    for f in range(n_frames):
+        start = min(max(f * hop_length - pad, 0), n - 1)
+        end = min(max(f * hop_length - pad + frame_length - 1, 0), n - 1)
+        out[f] = (crossings[end] - crossings[start]) / frame_length
+    return out
+
+
+def _percentile_partition(a: np.ndarray, q: float, axis: int = -1) -> np.ndarray:
+    """
+    Equivalente a np.percentile (interpolação linear) usando np.partition
+
+    Seleciona apenas as duas estatísticas de ordem vizinhas em O(n),
+    em vez de ordenar o eixo inteiro.
+    """
+    n = a.shape[axis]
+    pos = q / 100 * (n - 1)
+    lo = int(pos)
+    hi = min(lo + 1, n - 1)
+    part = np.partition(a, (lo, hi), axis=axis)
+    v_lo = np.take(part, lo, axis=axis)
+    v_hi = np.take(part, hi, axis=axis)
+    return v_lo + (pos - lo) * (v_hi - v_lo)
 
 
 class SpectralAnalyzer:
@@ -24,28 +112,76 @@ class SpectralAnalyzer:
         """
         self.sr = sr
 
-    def analyze_audio(self, audio_path: str) -> Dict:
+        # Cache do último áudio carregado: (caminho, mtime) -> (y, sr, S_mag)
+        self._audio_cache: Dict[Tuple[str, float], Tuple[np.ndarray, int, np.ndarray]] = {}
+
+        # Dados reduzidos da última análise em blocos, para visualize_analysis:
+        # (caminho, mtime) -> envelope, espectrograma amostrado, centroides, espectro médio
+        self._streaming_viz_cache: Dict[Tuple[str, float], Dict] = {}
+
+        # Grade de frequências da STFT (depende só de sr e n_fft)
+        self._stft_freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
+
+    def _get_audio(self, audio_path: str) -> Tuple[np.ndarray, int, np.ndarray]:
+        """
+        Carrega áudio e sua STFT (magnitude), reaproveitando o último resultado
+
+        analyze_audio e visualize_analysis costumam ser chamados em sequência
+        para o mesmo arquivo; só o arquivo mais recente fica em memória.
+        """
+        key = (os.path.abspath(audio_path), os.path.getmtime(audio_path))
+        if key not in self._audio_cache:
+            y, sr = librosa.load(audio_path, sr=self.sr)
+            S_mag = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+            self._audio_cache.clear()
+            self._audio_cache[key] = (y, sr, S_mag)
+        return self._audio_cache[key]
+
+    def clear_cache(self):
+        """Libera o áudio, a STFT e os dados de visualização mantidos em cache"""
+        self._audio_cache.clear()
+        self._streaming_viz_cache.clear()
+
+    def _get_streaming_viz(self, audio_path: str) -> Dict:
+        """Dados reduzidos para visualização de um arquivo analisado em blocos"""
+        key = (os.path.abspath(audio_path), os.path.getmtime(audio_path))
+        if key not in self._streaming_viz_cache:
+            self._analyze_audio_streaming(audio_path)
+        return self._streaming_viz_cache[key]
+
+    def analyze_audio(self, audio_path: str, compute_contrast: bool = False) -> Dict:
         """
         Realiza análise espectral completa do áudio
 
         Args:
             audio_path: Caminho para o arquivo de áudio
+            compute_contrast: Calcular spectral contrast (a feature mais cara;
+                              não é usada nas recomendações)
 
         Returns:
             Dicionário com análises espectrais
         """
-        # Carregar áudio
-        y, sr = librosa.load(audio_path, sr=self.sr)
+        # Arquivos grandes: analisar em blocos sem carregar o áudio inteiro
+        if self._should_stream(audio_path):
+            return self._analyze_audio_streaming(audio_path, compute_contrast)
+
+        # Carregar áudio e STFT (calculada uma única vez e compartilhada entre as análises)
+        y, sr, S_mag = self._get_audio(audio_path)
+
+        # Pico, RMS por frame e clipping fundidos em uma passada sobre o sinal
+        # (o buffer float32 já é necessário para a STFT; ler PCM int16 à parte
+        # só para o clipping exigiria um segundo decode do arquivo)
+        peak, rms, clipped_samples = fused_stats(y, 2048, 512, CLIP_THRESHOLD)
 
         analysis = {
             'file_path': audio_path,
             'sample_rate': sr,
             'duration': len(y) / sr,
-            'spectral_features': self._analyze_spectral_features(y, sr),
-            'frequency_analysis': self._analyze_frequency_content(y, sr),
-            'dynamic_range': self._analyze_dynamic_range(y),
-            'noise_profile': self._analyze_noise(y, sr),
-            'clipping_detection': self._detect_clipping(y),
+            'spectral_features': self._analyze_spectral_features(y, sr, S_mag, compute_contrast),
+            'frequency_analysis': self._analyze_frequency_content(S_mag.sum(axis=1), sr),
+            'dynamic_range': self._analyze_dynamic_range(y, peak, rms),
+            'noise_profile': self._analyze_noise(y, sr, S_mag, rms),
+            'clipping_detection': self._detect_clipping(y, clipped_samples),
             'recommendations': []
         }
 
@@ -54,24 +190,176 @@ class SpectralAnalyzer:
 
         return analysis
 
-    def _analyze_spectral_features(self, y: np.ndarray, sr: int) -> Dict:
-        """Analisa features espectrais do áudio"""
-
-        # Spectral centroid
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-
-        # Spectral rolloff
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+    def _should_stream(self, audio_path: str) -> bool:
+        """Arquivo grande, legível pelo soundfile e já no sample rate alvo"""
+        if os.path.getsize(audio_path) <= _STREAMING_MIN_BYTES:
+            return False
+        try:
+            info = sf.info(audio_path)
+        except RuntimeError:
+            return False
+        # librosa.stream não reamostra
+        return info.samplerate == self.sr
+
+    def _analyze_audio_streaming(self, audio_path: str, compute_contrast: bool = False) -> Dict:
+        """
+        Análise espectral em blocos para arquivos grandes
+
+        Mantém em memória apenas um bloco de áudio por vez; as reduções
+        (pico, clipping, espectro acumulado) são agregadas bloco a bloco e
+        as features por frame são concatenadas (arrays pequenos). O noise
+        floor usa uma amostra de no máximo _STREAMING_NOISE_FRAMES frames.
+        Os frames não são centralizados (center=False), então os valores
+        podem diferir ligeiramente da análise em memória.
+        """
+        sr = self.sr
+        n_fft = 2048
+        hop_length = 512
+        block_length = 256  # frames por bloco (~3s a 44.1kHz)
+        block_step = block_length * hop_length
+
+        total_frames = 1 + max(0, sf.info(audio_path).frames - n_fft) // hop_length
+        noise_stride = max(1, total_frames // _STREAMING_NOISE_FRAMES)
+
+        peak = 0.0
+        clipped_samples = 0
+        total_samples = 0
+        mag_sum = np.zeros(1 + n_fft // 2)
+        rms, centroids, rolloff, bandwidth, zcr, noise_frames = [], [], [], [], [], []
+        env_min, env_max = [], []
+        spec_max = 0.0
+        contrast_sum, contrast_frames = 0.0, 0
+        frame_offset = 0
+        tail = None
+
+        stream = librosa.stream(
+            audio_path,
+            block_length=block_length,
+            frame_length=n_fft,
+            hop_length=hop_length,
+            mono=True
+        )
+        for block in stream:
+            # Amostras novas deste bloco (o resto se sobrepõe ao próximo bloco)
+            head, tail = block[:block_step], block[block_step:]
+            block_peak, _, block_clipped = fused_stats(head, n_fft, hop_length, CLIP_THRESHOLD)
+            peak = max(peak, block_peak)
+            clipped_samples += block_clipped
+            total_samples += len(head)
+
+            # Envelope min/max por hop (para o waveform da visualização)
+            hops = head[:len(head) - len(head) % hop_length].reshape(-1, hop_length)
+            env_min.append(hops.min(axis=1))
+            env_max.append(hops.max(axis=1))
+
+            if len(block) < n_fft:
+                continue
+
+            S_blk = np.abs(librosa.stft(block, n_fft=n_fft, hop_length=hop_length, center=False))
+            mag_sum += S_blk.sum(axis=1)
+            spec_max = max(spec_max, S_blk.max())
+            rms.append(librosa.feature.rms(y=block, frame_length=n_fft, hop_length=hop_length, center=False)[0])
+            centroids.append(librosa.feature.spectral_centroid(S=S_blk, sr=sr)[0])
+            rolloff.append(librosa.feature.spectral_rolloff(S=S_blk, sr=sr)[0])
+            bandwidth.append(librosa.feature.spectral_bandwidth(S=S_blk, sr=sr)[0])
+            zcr.append(_zcr(block, n_fft, hop_length, False))
+            if compute_contrast:
+                contrast = librosa.feature.spectral_contrast(S=S_blk, sr=sr)
+                contrast_sum += float(contrast.sum())
+                contrast_frames += contrast.size
+
+            # Frames amostrados (índice global múltiplo de noise_stride)
+            first = (-frame_offset) % noise_stride
+            noise_frames.append(S_blk[:, first::noise_stride])
+            frame_offset += S_blk.shape[1]
+
+        # Cauda do último bloco ainda não contabilizada
+        if tail is not None and len(tail) > 0:
+            tail_peak, _, tail_clipped = fused_stats(tail, n_fft, hop_length, CLIP_THRESHOLD)
+            peak = max(peak, tail_peak)
+            clipped_samples += tail_clipped
+            total_samples += len(tail)
+
+        rms = np.concatenate(rms)
+        centroids = np.concatenate(centroids)
+        noise_frames = np.concatenate(noise_frames, axis=1)
+        contrast_mean = contrast_sum / contrast_frames if compute_contrast else None
+
+        # Visualização sem recarregar o arquivo (espectrograma com até ~2000 colunas)
+        viz_step = max(1, noise_frames.shape[1] // 2000)
+        key = (os.path.abspath(audio_path), os.path.getmtime(audio_path))
+        self._streaming_viz_cache.clear()
+        self._streaming_viz_cache[key] = {
+            'envelope': (np.concatenate(env_min), np.concatenate(env_max)),
+            'spectrogram': np.ascontiguousarray(noise_frames[:, ::viz_step]),
+            'spectrogram_hop': hop_length * noise_stride * viz_step,
+            'spectrogram_ref': spec_max,
+            'centroids': centroids,
+            'spectrum': mag_sum / max(frame_offset, 1)
+        }
 
-        # Spectral bandwidth
-        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
+        analysis = {
+            'file_path': audio_path,
+            'sample_rate': sr,
+            'duration': total_samples / sr,
+            'spectral_features': self._summarize_spectral_features(
+                centroids,
+                np.concatenate(rolloff),
+                np.concatenate(bandwidth),
+                np.concatenate(zcr),
+                contrast_mean
+            ),
+            'frequency_analysis': self._analyze_frequency_content(mag_sum, sr),
+            'dynamic_range': self._analyze_dynamic_range(None, peak, rms),
+            'noise_profile': self._analyze_noise(None, sr, noise_frames, rms),
+            'clipping_detection': self._detect_clipping(None, clipped_samples, total_samples),
+            'recommendations': []
+        }
 
-        # Spectral contrast
-        spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+        analysis['recommendations'] = self._generate_recommendations(analysis)
 
-        # Zero crossing rate
-        zcr = librosa.feature.zero_crossing_rate(y)[0]
+        return analysis
 
+    def _analyze_spectral_features(
+        self,
+        y: np.ndarray,
+        sr: int,
+        S_mag: np.ndarray,
+        compute_contrast: bool = False
+    ) -> Dict:
+        """Analisa features espectrais do áudio (a partir da STFT já calculada)"""
+
+        # Reduções independentes sobre S_mag (o numpy libera o GIL): rodar em threads
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            centroid_job = executor.submit(librosa.feature.spectral_centroid, S=S_mag, sr=sr)
+            rolloff_job = executor.submit(librosa.feature.spectral_rolloff, S=S_mag, sr=sr)
+            bandwidth_job = executor.submit(librosa.feature.spectral_bandwidth, S=S_mag, sr=sr)
+            contrast_job = (
+                executor.submit(librosa.feature.spectral_contrast, S=S_mag, sr=sr)
+                if compute_contrast else None
+            )
+
+            # Zero crossing rate (no domínio do tempo, na thread principal)
+            zcr = _zcr(y, 2048, 512, True)
+
+            spectral_centroids = centroid_job.result()[0]
+            spectral_rolloff = rolloff_job.result()[0]
+            spectral_bandwidth = bandwidth_job.result()[0]
+            contrast_mean = float(np.mean(contrast_job.result())) if contrast_job else None
+
+        return self._summarize_spectral_features(
+            spectral_centroids, spectral_rolloff, spectral_bandwidth, zcr, contrast_mean
+        )
+
+    def _summarize_spectral_features(
+        self,
+        spectral_centroids: np.ndarray,
+        spectral_rolloff: np.ndarray,
+        spectral_bandwidth: np.ndarray,
+        zcr: np.ndarray,
+        contrast_mean: Optional[float] = None
+    ) -> Dict:
+        """Resume as features espectrais por frame em médias/desvios"""
         return {
             'centroid_mean': float(np.mean(spectral_centroids)),
             'centroid_std': float(np.std(spectral_centroids)),
@@ -79,43 +367,35 @@ class SpectralAnalyzer:
             'rolloff_std': float(np.std(spectral_rolloff)),
             'bandwidth_mean': float(np.mean(spectral_bandwidth)),
             'bandwidth_std': float(np.std(spectral_bandwidth)),
-            'contrast_mean': float(np.mean(spectral_contrast)),
+            'contrast_mean': contrast_mean,
             'zcr_mean': float(np.mean(zcr)),
             'zcr_std': float(np.std(zcr))
         }
 
-    def _analyze_frequency_content(self, y: np.ndarray, sr: int) -> Dict:
-        """Analisa o conteúdo de frequências do áudio"""
-
-        # Calcular FFT
-        fft = np.fft.fft(y)
-        magnitude = np.abs(fft)
-        frequency = np.fft.fftfreq(len(y), 1/sr)
-
-        # Pegar apenas frequências positivas
-        positive_freq_idx = frequency > 0
-        frequency = frequency[positive_freq_idx]
-        magnitude = magnitude[positive_freq_idx]
-
-        # Analisar bandas de frequência
-        bands = {
-            'sub_bass': (20, 60),
-            'bass': (60, 250),
-            'low_mid': (250, 500),
-            'mid': (500, 2000),
-            'high_mid': (2000, 4000),
-            'presence': (4000, 6000),
-            'brilliance': (6000, 20000)
-        }
+    def _analyze_frequency_content(self, magnitude: np.ndarray, sr: int) -> Dict:
+        """
+        Analisa o conteúdo de frequências do áudio
+
+        Args:
+            magnitude: Espectro acumulado ao longo dos frames da STFT
+                       (S_mag.sum(axis=1), n_fft//2 + 1 bins)
+            sr: Sample rate
+        """
+        n_fft = 2 * (magnitude.shape[0] - 1)
+        if sr == self.sr and n_fft == 2048:
+            frequency = self._stft_freqs
+        else:
+            frequency = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
 
-        band_energy = {}
-        for band_name, (low, high) in bands.items():
-            band_mask = (frequency >= low) & (frequency <= high)
-            band_energy[band_name] = float(np.sum(magnitude[band_mask]))
+        # Pegar apenas frequências positivas (descartar DC)
+        frequency = frequency[1:]
+        magnitude = magnitude[1:]
+
+        # Analisar bandas de frequência (contíguas: uma única passada compilada)
+        sums = _bin_energy(magnitude, frequency, _BAND_EDGES)
 
         # Normalizar energias
-        total_energy = sum(band_energy.values())
-        band_energy_normalized = {k: v/total_energy for k, v in band_energy.items()}
+        band_energy_normalized = dict(zip(_BAND_NAMES, (sums / sums.sum()).tolist()))
 
         # Detectar frequências ausentes ou fracas
         nyquist = sr / 2
@@ -129,14 +409,17 @@ class SpectralAnalyzer:
             'nyquist_frequency': float(nyquist)
         }
 
-    def _analyze_dynamic_range(self, y: np.ndarray) -> Dict:
+    def _analyze_dynamic_range(
+        self,
+        y: np.ndarray,
+        peak: Optional[float] = None,
+        rms: Optional[np.ndarray] = None
+    ) -> Dict:
         """Analisa a dinâmica do áudio"""
 
-        # RMS
-        rms = librosa.feature.rms(y=y)[0]
-
-        # Peak
-        peak = np.max(np.abs(y))
+        # Peak e RMS por frame (reaproveitados se já calculados)
+        if peak is None or rms is None:
+            peak, rms, _ = fused_stats(y, 2048, 512, CLIP_THRESHOLD)
 
         # Crest factor
         crest_factor = peak / (np.mean(rms) + 1e-10)
@@ -153,12 +436,19 @@ class SpectralAnalyzer:
             'headroom_db': float(20 * np.log10(1.0 / (peak + 1e-10)))
         }
 
-    def _analyze_noise(self, y: np.ndarray, sr: int) -> Dict:
+    def _analyze_noise(
+        self,
+        y: np.ndarray,
+        sr: int,
+        S_mag: np.ndarray,
+        rms: Optional[np.ndarray] = None
+    ) -> Dict:
         """Analisa perfil de ruído do áudio"""
 
-        # Detectar seções silenciosas para estimar ruído
-        rms = librosa.feature.rms(y=y)[0]
-        threshold = np.percentile(rms, 10)  # 10% mais silencioso
+        # Detectar seções silenciosas para estimar ruído (RMS por frame reaproveitado)
+        if rms is None:
+            _, rms, _ = fused_stats(y, 2048, 512, CLIP_THRESHOLD)
+        threshold = _percentile_partition(rms, 10)  # 10% mais silencioso
 
         silent_frames = rms < threshold
 
@@ -173,8 +463,7 @@ class SpectralAnalyzer:
         snr = 10 * np.log10((signal_power + 1e-10) / (noise_power + 1e-10))
 
         # Detectar ruído de fundo constante
-        S = np.abs(librosa.stft(y))
-        noise_floor = np.percentile(S, 5, axis=1)
+        noise_floor = _percentile_partition(S_mag, 5, axis=1)
 
         return {
             'snr_db': float(snr),
@@ -183,13 +472,19 @@ class SpectralAnalyzer:
             'noise_severity': 'high' if snr < 20 else 'medium' if snr < 40 else 'low'
         }
 
-    def _detect_clipping(self, y: np.ndarray) -> Dict:
+    def _detect_clipping(
+        self,
+        y: np.ndarray,
+        clipped_samples: Optional[int] = None,
+        total_samples: Optional[int] = None
+    ) -> Dict:
         """Detecta clipping no áudio"""
 
-        # Detectar samples próximos ao máximo
-        clip_threshold = 0.99
-        clipped_samples = np.sum(np.abs(y) > clip_threshold)
-        total_samples = len(y)
+        # Detectar samples próximos ao máximo (reaproveitado se já calculado)
+        if clipped_samples is None:
+            _, _, clipped_samples = fused_stats(y, 2048, 512, CLIP_THRESHOLD)
+        if total_samples is None:
+            total_samples = len(y)
         clip_percentage = (clipped_samples / total_samples) * 100
 
         return {
@@ -252,24 +547,49 @@ class SpectralAnalyzer:
             audio_path: Caminho para o arquivo de áudio
             output_path: Caminho para salvar a visualização
         """
-        y, sr = librosa.load(audio_path, sr=self.sr)
-
-        fig, axes = plt.subplots(4, 1, figsize=(14, 12))
+        # Arquivos grandes: usar os dados reduzidos da análise em blocos
+        # em vez de carregar o áudio inteiro e sua STFT
+        streaming = self._should_stream(audio_path)
+        if streaming:
+            viz = self._get_streaming_viz(audio_path)
+            sr = self.sr
+        else:
+            y, sr, S_mag = self._get_audio(audio_path)
+
+        # Figure direto (sem pyplot): sem estado global nem janela de backend
+        fig = Figure(figsize=(14, 12))
+        axes = fig.subplots(4, 1)
 
         # Waveform
-        librosa.display.waveshow(y, sr=sr, ax=axes[0])
+        if streaming:
+            # Envelope min/max por hop (o mesmo desenho do waveshow em zoom-out)
+            lo, hi = viz['envelope']
+            t = librosa.frames_to_time(np.arange(len(hi)), sr=sr, hop_length=512)
+            axes[0].fill_between(t, lo, hi)
+        else:
+            librosa.display.waveshow(y, sr=sr, ax=axes[0])
         axes[0].set_title('Waveform')
         axes[0].set_xlabel('Time (s)')
         axes[0].set_ylabel('Amplitude')
 
-        # Spectrogram
-        D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
-        img = librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log', ax=axes[1])
+        # Spectrogram (no máximo ~2000 colunas de tempo; mais que isso não aparece no PNG)
+        if streaming:
+            S_cols, hop_cols, ref = viz['spectrogram'], viz['spectrogram_hop'], viz['spectrogram_ref']
+        else:
+            step = max(1, S_mag.shape[1] // 2000)
+            S_cols, hop_cols, ref = S_mag[:, ::step], 512 * step, np.max(S_mag)
+        D = librosa.amplitude_to_db(S_cols, ref=ref)
+        img = librosa.display.specshow(
+            D, sr=sr, hop_length=hop_cols, x_axis='time', y_axis='log', ax=axes[1]
+        )
         axes[1].set_title('Spectrogram')
         fig.colorbar(img, ax=axes[1], format='%+2.0f dB')
 
         # Spectral features
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+        if streaming:
+            spectral_centroids = viz['centroids']
+        else:
+            spectral_centroids = librosa.feature.spectral_centroid(S=S_mag, sr=sr)[0]
         frames = range(len(spectral_centroids))
         t = librosa.frames_to_time(frames, sr=sr)
         axes[2].plot(t, spectral_centroids)
@@ -278,21 +598,31 @@ class SpectralAnalyzer:
         axes[2].set_ylabel('Hz')
 
         # Frequency spectrum
-        fft = np.fft.fft(y)
-        magnitude = np.abs(fft)
-        frequency = np.fft.fftfreq(len(y), 1/sr)
-        positive_freq_idx = frequency > 0
-        axes[3].semilogx(frequency[positive_freq_idx], 20 * np.log10(magnitude[positive_freq_idx] + 1e-10))
+        if streaming:
+            # Espectro médio da STFT (resolução de n_fft=2048)
+            frequency = self._stft_freqs
+            magnitude = viz['spectrum']
+        else:
+            # FFT real, tamanho "rápido", multi-thread
+            n = next_fast_len(len(y), real=True)
+            fft = rfft(y, n=n, workers=-1)
+            magnitude = np.abs(fft)
+            frequency = rfftfreq(n, 1 / sr)
+        # Espectros unilaterais: só descartar o bin DC (views, sem cópia)
+        axes[3].semilogx(frequency[1:], 20 * np.log10(magnitude[1:] + 1e-10))
         axes[3].set_title('Frequency Spectrum')
         axes[3].set_xlabel('Frequency (Hz)')
         axes[3].set_ylabel('Magnitude (dB)')
         axes[3].grid(True)
 
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(
+            output_path,
+            dpi=150,
+            bbox_inches='tight',
+            pil_kwargs={'optimize': False, 'compress_level': 1}
+        )
 
     def save_analysis(self, analysis: Dict, output_path: str):
         """Salva a análise em JSON"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(analysis, f, indent=2, ensure_ascii=False)
+        write_json(analysis, output_path)
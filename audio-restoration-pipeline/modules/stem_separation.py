@@ -6,14 +6,70 @@ Separa áudio em componentes individuais (vocal, bateria, baixo, outros)
 import numpy as np
 import librosa
 import soundfile as sf
-from typing import Dict, List, Optional
+import scipy.signal as signal
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
 import os
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from ._utils import CLIP_THRESHOLD, fused_stats, write_stem
+
+
+@lru_cache(maxsize=16)
+def _butter_response(
+    order: int,
+    cutoff: Union[float, Tuple[float, float]],
+    btype: str,
+    sr: int,
+    n_fft: int
+) -> np.ndarray:
+    """
+    Resposta em magnitude |H(f)| de um Butterworth nos bins da STFT
+
+    Aplicada como máscara espectral no lugar de filtrar o sinal no tempo.
+    """
+    sos = signal.butter(order, cutoff, btype=btype, fs=sr, output='sos')
+    _, h = signal.sosfreqz(sos, worN=librosa.fft_frequencies(sr=sr, n_fft=n_fft), fs=sr)
+    response = np.abs(h).astype(np.float32)
+    response.setflags(write=False)  # Compartilhada entre chamadas
+    return response
+
+
+@lru_cache(maxsize=8)
+def _vocal_boost(sr: int, n_fft: int) -> np.ndarray:
+    """Ganho por bin da STFT: 1.3 nos formantes vocais (1-4 kHz), 1.0 no resto"""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    boost = np.ones(len(freqs), dtype=np.float32)
+    boost[(freqs >= 1000) & (freqs <= 4000)] = 1.3
+    boost.setflags(write=False)  # Compartilhado entre chamadas
+    return boost
+
 
 class StemSeparator:
     """Separa áudio em stems individuais"""
 
+    # Disponibilidade do Demucs, verificada uma vez por processo
+    _env_checked = False
+    _demucs_available = False
+
+    @classmethod
+    def _ensure_environment(cls):
+        """Verifica se torch e demucs estão instalados (sem importá-los nem abrir subprocessos)"""
+        if cls._env_checked:
+            return
+        cls._demucs_available = all(
+            importlib.util.find_spec(name) is not None for name in ('torch', 'demucs')
+        )
+        cls._env_checked = True
+
+    @classmethod
+    def demucs_available(cls) -> bool:
+        """Indica se torch e demucs estão instalados (verificado uma vez por processo)"""
+        cls._ensure_environment()
+        return cls._demucs_available
+
     def __init__(self, sr: int = 44100):
         """
         Inicializa o separador de stems
@@ -24,6 +80,46 @@ class StemSeparator:
         self.sr = sr
         self.available_models = ['demucs', 'basic']
 
+        # Modelo Demucs carregado sob demanda e reaproveitado entre chamadas
+        self._demucs_model = None
+        self._demucs_device = None
+
+        # Segmentos do Demucs processados por forward (reduzido se faltar memória)
+        self.demucs_batch_size = 8
+
+    def _load_audio(
+        self,
+        path: str,
+        sr: Optional[int] = None,
+        mono: bool = True
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Carrega áudio em float32 com soundfile, reamostrando só se necessário
+
+        Mesmo layout do librosa.load: (samples,) ou (channels, samples).
+        Formatos que o libsndfile não lê caem no librosa.load.
+
+        Args:
+            path: Caminho do áudio
+            sr: Sample rate desejado (None = self.sr)
+            mono: Converter para mono
+
+        Returns:
+            Tupla (áudio, sample rate)
+        """
+        sr = sr or self.sr
+        try:
+            y, file_sr = sf.read(path, dtype='float32')
+        except RuntimeError:
+            return librosa.load(path, sr=sr, mono=mono)
+
+        if y.ndim > 1:
+            y = y.mean(axis=1) if mono else y.T
+        if file_sr != sr:
+            y = librosa.resample(y, orig_sr=file_sr, target_sr=sr, res_type='soxr_hq')
+
+        return y, sr
+
     def separate_stems(
         self,
         audio_path: str,
@@ -52,6 +148,166 @@ class StemSeparator:
         else:
             raise ValueError(f"Modelo desconhecido: {model}")
 
+    def _get_demucs_model(self):
+        """
+        Carrega o modelo htdemucs uma única vez e o mantém residente
+
+        Returns:
+            Tupla (modelo, dispositivo)
+        """
+        if self._demucs_model is None:
+            self._ensure_environment()
+            if not self._demucs_available:
+                raise ImportError("Demucs não instalado. Instale com: pip install demucs")
+
+            import torch
+            from demucs.pretrained import get_model
+
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            print(f"🎵 Carregando Demucs (htdemucs) em {device.upper()}...")
+            model = get_model('htdemucs').to(device).eval()
+            if device == 'cuda' and hasattr(torch, 'compile'):
+                self._compile_demucs(model, device)
+            self._demucs_model = model
+            self._demucs_device = device
+
+        return self._demucs_model, self._demucs_device
+
+    def _compile_demucs(self, model, device: str):
+        """
+        Compila os modelos do bag com torch.compile e faz o warm-up
+
+        _apply_demucs sempre chama o forward com lotes do mesmo shape
+        (segmentos do tamanho de treino, último lote completado com zeros),
+        então os CUDA Graphs do modo reduce-overhead são reaproveitados. Se a
+        compilação falhar, os modelos originais são mantidos.
+        """
+        import torch
+
+        originals = list(model.models)
+        try:
+            for i, sub_model in enumerate(originals):
+                model.models[i] = torch.compile(sub_model, mode='reduce-overhead', fullgraph=False)
+
+            # Warm-up com um segmento de silêncio: a primeira chamada real não paga a compilação
+            segment_len = int(float(originals[0].segment) * model.samplerate)
+            self._apply_demucs(model, torch.zeros(model.audio_channels, segment_len), device)
+        except Exception as e:
+            print(f"⚠️ torch.compile indisponível ({e}); usando Demucs sem compilação")
+            for i, sub_model in enumerate(originals):
+                model.models[i] = sub_model
+
+    def _apply_demucs(self, model, wav, device: str, overlap: float = 0.25):
+        """
+        Roda o Demucs sobre wav (channels, samples) e retorna (stems, channels, samples)
+
+        O áudio é dividido nos mesmos segmentos do apply_model (tamanho de
+        treino do modelo; os trechos finais mais curtos são centralizados
+        com contexto real e a saída é recortada), empilhados em lotes de
+        self.demucs_batch_size e processados com um forward por lote; as
+        estimativas são recombinadas por overlap-add com a mesma janela
+        triangular do apply_model.
+
+        Áudio e resultado ficam na CPU: só o lote atual vai para a GPU, então
+        a memória de vídeo não cresce com a duração da faixa. Em CUDA o
+        próximo lote é enviado (memória pinned, stream separado) enquanto o
+        atual é processado, o último lote é completado com silêncio para
+        manter o shape fixo, a inferência usa autocast FP16 (normalizações e
+        FFT ficam em FP32) e, se faltar memória, o lote é reduzido pela metade.
+        """
+        import torch
+
+        on_gpu = device == 'cuda'
+        channels, length = wav.shape
+        n_sources = len(model.sources)
+        estimates = torch.zeros(n_sources, channels, length)
+        total_weight = torch.zeros(n_sources, 1, 1)
+        copy_stream = torch.cuda.Stream() if on_gpu else None
+
+        for sub_model, source_weights in zip(model.models, model.weights):
+            segment_len = int(float(sub_model.segment) * model.samplerate)
+            hop = int(segment_len * (1 - overlap))
+
+            # Segmento k cobre [offset, offset + chunk_len) da saída; a entrada é a janela de
+            # segment_len amostras centrada nele (zeros fora do áudio)
+            offsets = list(range(0, length, hop))
+            chunk_lens = [min(segment_len, length - offset) for offset in offsets]
+            trims = [(segment_len - chunk_len) // 2 for chunk_len in chunk_lens]
+            n_segments = len(offsets)
+            padded = torch.zeros(channels, length + 2 * segment_len)
+            padded[:, segment_len:segment_len + length] = wav
+
+            # Janela triangular (nunca zero) e soma das janelas para normalizar
+            window = torch.cat([
+                torch.arange(1, segment_len // 2 + 1),
+                torch.arange(segment_len - segment_len // 2, 0, -1)
+            ]).float()
+            out = torch.zeros(n_sources, channels, length)
+            window_sum = torch.zeros(length)
+
+            batch_size = self.demucs_batch_size
+
+            # Dois buffers pinned alternados: um é enviado enquanto o outro é processado
+            staging = [
+                torch.zeros(batch_size, channels, segment_len, pin_memory=on_gpu)
+                for _ in range(2 if on_gpu else 0)
+            ]
+
+            def upload(first: int, batch_size: int, slot: int):
+                """Prepara o lote que começa em first (envio assíncrono em CUDA)"""
+                n_valid = min(batch_size, n_segments - first)
+                buffer = (
+                    staging[slot][:batch_size] if on_gpu
+                    else torch.empty(n_valid, channels, segment_len)
+                )
+                for j in range(n_valid):
+                    start = segment_len + offsets[first + j] - trims[first + j]
+                    buffer[j].copy_(padded[:, start:start + segment_len])
+                if not on_gpu:
+                    return buffer, n_valid
+                buffer[n_valid:].zero_()
+                with torch.cuda.stream(copy_stream):
+                    return buffer.to(device, non_blocking=True), n_valid
+
+            first, slot = 0, 0
+            pending = upload(first, batch_size, slot)
+            while first < n_segments:
+                batch, n_valid = pending
+                try:
+                    if on_gpu:
+                        torch.cuda.current_stream().wait_stream(copy_stream)
+                        batch.record_stream(torch.cuda.current_stream())
+                    with torch.inference_mode(), torch.autocast('cuda', dtype=torch.float16, enabled=on_gpu):
+                        batch_out = sub_model(batch)
+
+                    # Enviar o próximo lote enquanto a GPU processa o atual
+                    slot ^= 1
+                    if first + n_valid < n_segments:
+                        pending = upload(first + n_valid, batch_size, slot)
+
+                    batch_out = batch_out.float().cpu()
+                except torch.cuda.OutOfMemoryError:
+                    if batch_size == 1:
+                        raise
+                    batch_size //= 2
+                    torch.cuda.empty_cache()
+                    pending = upload(first, batch_size, slot)
+                    continue
+
+                for j in range(n_valid):
+                    offset, chunk_len, trim = offsets[first + j], chunk_lens[first + j], trims[first + j]
+                    chunk_window = window[:chunk_len]
+                    out[..., offset:offset + chunk_len] += batch_out[j, ..., trim:trim + chunk_len] * chunk_window
+                    window_sum[offset:offset + chunk_len] += chunk_window
+                first += n_valid
+
+            # Média ponderada por stem entre os modelos do bag
+            source_weights = torch.tensor(source_weights, dtype=torch.float32)[:, None, None]
+            estimates += source_weights * (out / window_sum)
+            total_weight += source_weights
+
+        return estimates / total_weight
+
     def _separate_with_demucs(
         self,
         audio_path: str,
@@ -62,221 +318,52 @@ class StemSeparator:
         Separa usando Demucs (state-of-the-art)
         Nota: Requer instalação do Demucs no ambiente
 
+        Roda no próprio processo (sem CLI): o modelo fica em memória entre
+        chamadas e os stems são gravados direto dos tensores.
+
         Args:
             audio_path: Caminho do áudio
             output_dir: Diretório de saída
-            stems: Stems desejados
+            stems: Stems desejados (None = todos)
 
         Returns:
             Dicionário com caminhos dos stems
         """
         try:
-            import subprocess
             import torch
 
-            # Verificar se demucs está instalado
-            try:
-                result = subprocess.run(['demucs', '--help'], capture_output=True, check=True, text=True, timeout=10)
-                print("✓ Demucs já instalado!")
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                print("⚠️ Demucs não encontrado. Instalando...")
-                print("   Instalando Demucs + torchcodec (dependência)...")
-
-                # Instalar Demucs E torchcodec (necessário para salvar arquivos)
-                install_result = subprocess.run(
-                    ['pip', 'install', '-U', 'demucs', 'torchcodec'],
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
-
-                if install_result.returncode != 0:
-                    print(f"⚠️ Erro na instalação: {install_result.stderr}")
-                    raise Exception("Falha ao instalar Demucs")
+            model, device = self._get_demucs_model()
 
-                print("✓ Demucs + torchcodec instalados!")
+            # Carregar no sample rate e número de canais do modelo
+            y, _ = self._load_audio(audio_path, sr=model.samplerate, mono=False)
+            if y.ndim == 1:
+                y = np.tile(y, (model.audio_channels, 1))
+            wav = torch.from_numpy(np.ascontiguousarray(y))
 
-            # VERIFICAR E INSTALAR FFMPEG + TORCHCODEC
-            # (Necessários para Demucs salvar os arquivos WAV)
+            # Mesma normalização usada pelo CLI do Demucs
+            ref = wav.mean(0)
+            ref_mean, ref_std = ref.mean(), ref.std() + 1e-8
+            wav = (wav - ref_mean) / ref_std
 
-            # Primeiro, verificar/instalar FFmpeg
-            print("🔍 Verificando FFmpeg...")
-            ffmpeg_check = subprocess.run(
-                ['ffmpeg', '-version'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            print(f"🎵 Executando Demucs: {Path(audio_path).name}")
+            sources = self._apply_demucs(model, wav, device)
+            sources = sources * ref_std + ref_mean
 
-            if ffmpeg_check.returncode != 0:
-                print("⚠️ FFmpeg não encontrado!")
-                print("   Tentando instalar FFmpeg...")
-
-                # Tentar instalar via apt-get (Colab/Linux)
-                try:
-                    subprocess.run(['apt-get', 'update'], capture_output=True, timeout=30, check=False)
-                    ffmpeg_install = subprocess.run(
-                        ['apt-get', 'install', '-y', 'ffmpeg'],
-                        capture_output=True,
-                        text=True,
-                        timeout=120
-                    )
-
-                    if ffmpeg_install.returncode == 0:
-                        print("   ✓ FFmpeg instalado!")
-                    else:
-                        print("   ✗ Não foi possível instalar FFmpeg automaticamente")
-                        print("   ")
-                        print("   ⚠️ SOLUÇÃO:")
-                        print("   Execute esta célula ANTES de rodar o processamento:")
-                        print("   !apt-get update && apt-get install -y ffmpeg")
-                        print("   ")
-                except Exception as e:
-                    print(f"   ✗ Erro ao tentar instalar FFmpeg: {e}")
-                    print("   ")
-                    print("   ⚠️ SOLUÇÃO MANUAL:")
-                    print("   No Google Colab, execute em uma célula:")
-                    print("   !apt-get update && apt-get install -y ffmpeg")
-                    print("   ")
-            else:
-                print("✓ FFmpeg já instalado!")
-
-            # Verificar TorchCodec
-            try:
-                import torchcodec
-                # Verificar se torchcodec pode realmente carregar
-                print("✓ TorchCodec verificado!")
-            except (ImportError, RuntimeError) as e:
-                print("⚠️ TorchCodec não disponível")
-                print("   Instalando TorchCodec...")
-
-                install_result = subprocess.run(
-                    ['pip', 'install', '-U', 'torchcodec'],
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
-
-                if install_result.returncode == 0:
-                    print("✓ TorchCodec instalado!")
-                    print("   IMPORTANTE: Se Demucs falhar, execute em uma célula:")
-                    print("   !apt-get update && apt-get install -y ffmpeg")
-                else:
-                    print(f"⚠️ Falha ao instalar torchcodec")
-
-            # Detectar dispositivo (GPU/CPU)
-            device = 'cuda' if torch.cuda.is_available() else 'cpu'
-
-            # COMANDO SIMPLIFICADO E ROBUSTO
-            # Usar htdemucs (modelo padrão e confiável) ao invés de htdemucs_ft
-            # Não usar --float32 para evitar problemas de compatibilidade
-            cmd = [
-                'demucs',
-                '--device', device,
-                '-n', 'htdemucs',  # Modelo padrão (4 stems: vocals, drums, bass, other)
-                '-o', output_dir,  # Output directory
-                audio_path
-            ]
-
-            print(f"🎵 Executando Demucs...")
-            print(f"   Modelo: htdemucs (4 stems)")
-            print(f"   Dispositivo: {device.upper()}")
-            if device == 'cuda':
-                gpu_name = torch.cuda.get_device_name(0)
-                gpu_mem = torch.cuda.get_device_properties(0).total_memory / (1024**3)
-                print(f"   GPU: {gpu_name} ({gpu_mem:.1f} GB)")
-            print(f"   Input: {Path(audio_path).name}")
-            print(f"   Comando: {' '.join(cmd)}")
-
-            # Executar COM CAPTURA DE STDERR para ver erros reais
-            print("   Processando... (pode demorar 5-15 minutos)\n")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,  # CAPTURAR output para ver erros
-                text=True,
-                timeout=900  # Timeout de 15 minutos
-            )
-
-            # Mostrar output se houver
-            if result.stdout:
-                print("📋 Output do Demucs:")
-                for line in result.stdout.split('\n'):
-                    if line.strip():
-                        print(f"   {line}")
-
-            # VERIFICAR SE HOUVE ERRO
-            if result.returncode != 0:
-                error_msg = f"Demucs falhou com código de erro {result.returncode}"
-                if result.stderr:
-                    error_msg += f"\n\n❌ MENSAGEM DE ERRO DO DEMUCS:\n{result.stderr}"
-                    # Mostrar stderr também
-                    print("\n❌ STDERR do Demucs:")
-                    for line in result.stderr.split('\n'):
-                        if line.strip():
-                            print(f"   {line}")
-                raise Exception(error_msg)
-
-            print("\n✓ Demucs executado com sucesso!")
-
-            # Encontrar arquivos de saída
-            # Demucs salva em: output_dir / model_name / audio_name / *.wav
-            audio_name = Path(audio_path).stem
-
-            # Tentar diferentes nomes de modelo
-            possible_model_names = ['htdemucs_ft', 'htdemucs', 'htdemucs_6s', 'mdx_extra', 'mdx']
-            demucs_output = None
-
-            print(f"\n🔍 Procurando stems gerados...")
-            for model_name in possible_model_names:
-                test_path = Path(output_dir) / model_name / audio_name
-                print(f"   Testando: {model_name}/{audio_name}")
-                if test_path.exists():
-                    demucs_output = test_path
-                    print(f"   ✓ Encontrado em: {model_name}/{audio_name}")
-                    break
-
-            if demucs_output is None:
-                # DEBUG: Listar o que realmente existe
-                print(f"\n⚠️ Stems não encontrados nos locais esperados!")
-                print(f"   Listando conteúdo de: {output_dir}\n")
-                try:
-                    for item in Path(output_dir).iterdir():
-                        print(f"   📁 {item.name}")
-                        if item.is_dir():
-                            for subitem in item.iterdir():
-                                print(f"      📁 {subitem.name}")
-                                if subitem.is_dir():
-                                    for file in subitem.iterdir():
-                                        print(f"         📄 {file.name}")
-                except Exception as list_error:
-                    print(f"   Erro ao listar: {list_error}")
-
-                raise Exception(f"Output do Demucs não encontrado em nenhum local esperado")
-
-            # Coletar stems
+            # Salvar stems (channels, samples) -> (samples, channels)
             stem_paths = {}
-            print(f"\n✓ Coletando stems:")
-            for stem_file in demucs_output.glob('*.wav'):
-                stem_name = stem_file.stem
-                stem_paths[stem_name] = str(stem_file)
-                file_size_mb = stem_file.stat().st_size / (1024 * 1024)
-                print(f"   ✓ {stem_name:8s}: {stem_file.name} ({file_size_mb:.2f} MB)")
-
-            if not stem_paths:
-                raise Exception("Demucs executou mas não gerou arquivos WAV")
-
-            print(f"\n✓ Separação com Demucs completa! {len(stem_paths)} stems.")
+            for source, stem_name in zip(sources, model.sources):
+                if stems is not None and stem_name not in stems:
+                    continue
+                stem_path = os.path.join(output_dir, f'{stem_name}.wav')
+                write_stem(stem_path, source.cpu().numpy().T, model.samplerate)
+                stem_paths[stem_name] = stem_path
+
+            print(f"✓ Separação com Demucs completa! {len(stem_paths)} stems.")
             return stem_paths
 
-        except subprocess.TimeoutExpired:
-            print(f"\n✗ TIMEOUT: Demucs demorou mais de 15 minutos!")
-            print("   Possíveis causas:")
-            print("   - Arquivo muito grande")
-            print("   - GPU sem memória suficiente")
-            print("   - Problema de performance")
-            print("\n⚠️ Fallback: Usando método básico...")
-            return self._separate_basic(audio_path, output_dir)
-
+        except ImportError:
+            # Demucs não instalado: falhar cedo em vez de mascarar com o fallback
+            raise
         except Exception as e:
             print(f"\n✗ ERRO ao usar Demucs:")
             print(f"   {str(e)}")
@@ -300,116 +387,92 @@ class StemSeparator:
             Dicionário com caminhos dos stems
         """
         # Carregar áudio
-        y, sr = librosa.load(audio_path, sr=self.sr, mono=False)
+        y, sr = self._load_audio(audio_path, mono=False)
+        stereo = len(y.shape) > 1
 
-        # Se estéreo, converter para mono para processamento
-        if len(y.shape) > 1:
+        # Se estéreo, converter para mono para processamento (uma vez só)
+        if stereo:
             y_mono = librosa.to_mono(y)
         else:
             y_mono = y
 
-        # Separar componentes usando diferentes técnicas
-        stems = {}
-
-        # 1. Separar vocais (frequências médias-altas + centro estéreo)
-        vocals = self._extract_vocals_basic(y, sr)
-        vocal_path = os.path.join(output_dir, 'vocals.wav')
-        sf.write(vocal_path, vocals, sr)
-        stems['vocals'] = vocal_path
-
-        # 2. Separar bateria (percussivo)
-        drums = self._extract_drums_basic(y_mono, sr)
-        drums_path = os.path.join(output_dir, 'drums.wav')
-        sf.write(drums_path, drums, sr)
-        stems['drums'] = drums_path
-
-        # 3. Separar baixo (frequências baixas harmônicas)
-        bass = self._extract_bass_basic(y_mono, sr)
-        bass_path = os.path.join(output_dir, 'bass.wav')
-        sf.write(bass_path, bass, sr)
-        stems['bass'] = bass_path
-
-        # 4. "Outros" = original - (vocals + drums + bass)
-        # Reconstruir outros por subtração
-        if len(y.shape) > 1:
-            y_for_subtraction = librosa.to_mono(y)
-        else:
-            y_for_subtraction = y
+        # STFT única, compartilhada por todos os stems (mesma fase em todos)
+        n_fft = 2048
+        D = librosa.stft(y_mono, n_fft=n_fft)
+
+        # Máscaras do HPSS (a mesma separação de librosa.effects.hpss)
+        mask_harmonic, mask_percussive = librosa.decompose.hpss(np.abs(D), margin=3.0, mask=True)
+
+        # Máscara espectral de cada stem ("outros" sai por subtração, abaixo)
+        masks = {
+            # 1. Vocais (frequências médias-altas + centro estéreo)
+            'vocals': self._vocals_mask_basic(sr, n_fft, stereo)[:, None],
+            # 2. Bateria (percussivo)
+            'drums': self._drums_mask_basic(mask_percussive, sr, n_fft),
+            # 3. Baixo (frequências baixas harmônicas)
+            'bass': self._bass_mask_basic(mask_harmonic, sr, n_fft),
+        }
 
-        # Garantir mesmo tamanho
-        min_len = min(len(y_for_subtraction), len(vocals), len(drums), len(bass))
-        other = y_for_subtraction[:min_len] - (
-            vocals[:min_len] + drums[:min_len] + bass[:min_len]
-        )
+        # Caminhos de saída dos stems
+        stems = {
+            name: os.path.join(output_dir, f'{name}.wav')
+            for name in ('vocals', 'drums', 'bass', 'other')
+        }
 
-        other_path = os.path.join(output_dir, 'other.wav')
-        sf.write(other_path, other, sr)
-        stems['other'] = other_path
+        def render(name: str) -> np.ndarray:
+            """Inverte a STFT mascarada do stem (mesmo tamanho do original)"""
+            return librosa.istft(D * masks[name], n_fft=n_fft, length=len(y_mono))
+
+        # iSTFTs e gravações independentes (numpy FFT e libsndfile liberam o GIL)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            jobs = {name: executor.submit(render, name) for name in masks}
+            vocals, drums, bass = (jobs[name].result() for name in ('vocals', 'drums', 'bass'))
+            writes = [
+                executor.submit(write_stem, stems[name], stem, sr)
+                for name, stem in (('vocals', vocals), ('drums', drums), ('bass', bass))
+            ]
 
-        return stems
+            # 4. "Outros" = original - (vocals + drums + bass)
+            # Por subtração os 4 stems somam exatamente o original (o que
+            # reconstruct_from_stems com ganhos 0 dB espera); como os stems
+            # compartilham a fase da STFT, o resíduo não tem desalinhamento
+            other = np.empty(len(y_mono), dtype=np.result_type(y_mono, vocals, drums, bass))
+            np.add(vocals, drums, out=other)
+            np.add(other, bass, out=other)
+            np.subtract(y_mono, other, out=other)
+            writes.append(executor.submit(write_stem, stems['other'], other, sr))
 
-    def _extract_vocals_basic(self, y: np.ndarray, sr: int) -> np.ndarray:
-        """Extrai vocais usando separação de centro estéreo e filtragem"""
+            # Propagar erros de gravação
+            for write in writes:
+                write.result()
 
-        if len(y.shape) > 1:
-            # Stereo: extrair centro (onde geralmente está o vocal)
-            # Centro = (L + R) / 2, Sides = (L - R) / 2
-            center = np.mean(y, axis=0)
+        return stems
 
-            # Filtrar range vocal (100Hz - 8kHz)
-            from scipy import signal
-            sos = signal.butter(4, [100, 8000], btype='band', fs=sr, output='sos')
-            vocals = signal.sosfilt(sos, center)
+    def _vocals_mask_basic(self, sr: int, n_fft: int, stereo: bool) -> np.ndarray:
+        """Ganho por bin para vocais: range vocal e, em estéreo, realce dos formantes"""
 
-            # Realçar usando compressão espectral
-            D = librosa.stft(vocals)
-            magnitude = np.abs(D)
+        # Filtrar range vocal (100Hz - 8kHz)
+        mask = _butter_response(4, (100, 8000), 'band', sr, n_fft)
 
+        if stereo:
+            # Stereo: o centro (mono) é onde geralmente está o vocal
             # Realçar formantes vocais (1-4 kHz)
-            freqs = librosa.fft_frequencies(sr=sr)
-            vocal_range = (freqs >= 1000) & (freqs <= 4000)
-            magnitude[vocal_range] *= 1.3
+            mask = mask * _vocal_boost(sr, n_fft)
 
-            # Reconstruir
-            D_enhanced = magnitude * np.exp(1j * np.angle(D))
-            vocals = librosa.istft(D_enhanced)
-
-            return vocals
-        else:
-            # Mono: apenas filtrar range vocal
-            from scipy import signal
-            sos = signal.butter(4, [100, 8000], btype='band', fs=sr, output='sos')
-            vocals = signal.sosfilt(sos, y)
-            return vocals
+        return mask
 
-    def _extract_drums_basic(self, y: np.ndarray, sr: int) -> np.ndarray:
-        """Extrai bateria usando separação harmônico-percussiva"""
-
-        # Usar HPSS do librosa
-        y_harmonic, y_percussive = librosa.effects.hpss(y, margin=3.0)
+    def _drums_mask_basic(self, mask_percussive: np.ndarray, sr: int, n_fft: int) -> np.ndarray:
+        """Máscara de bateria a partir da máscara percussiva do HPSS"""
 
         # Bateria é principalmente percussiva
         # Realçar ainda mais removendo muito das frequências baixas sustentadas
-        from scipy import signal
-
-        # Filtro para remover sub-bass sustentado
-        sos = signal.butter(2, 60, btype='high', fs=sr, output='sos')
-        drums = signal.sosfilt(sos, y_percussive)
-
-        return drums
-
-    def _extract_bass_basic(self, y: np.ndarray, sr: int) -> np.ndarray:
-        """Extrai baixo usando filtragem de frequências baixas"""
-
-        # Usar HPSS para pegar parte harmônica
-        y_harmonic, _ = librosa.effects.hpss(y, margin=3.0)
+        return mask_percussive * _butter_response(2, 60, 'high', sr, n_fft)[:, None]
 
-        # Filtrar apenas frequências de baixo (20Hz - 250Hz)
-        from scipy import signal
-        sos = signal.butter(4, [20, 250], btype='band', fs=sr, output='sos')
-        bass = signal.sosfilt(sos, y_harmonic)
+    def _bass_mask_basic(self, mask_harmonic: np.ndarray, sr: int, n_fft: int) -> np.ndarray:
+        """Máscara de baixo: frequências baixas da máscara harmônica do HPSS"""
 
-        return bass
+        # Apenas frequências de baixo (20Hz - 250Hz)
+        return mask_harmonic * _butter_response(4, (20, 250), 'band', sr, n_fft)[:, None]
 
     def reconstruct_from_stems(
         self,
@@ -431,36 +494,30 @@ class StemSeparator:
         if stem_gains is None:
             stem_gains = {stem: 0.0 for stem in stem_paths.keys()}
 
-        # Carregar todos os stems
-        stems_audio = {}
+        # Tamanho final a partir do cabeçalho dos arquivos (sem decodificar)
         max_length = 0
+        for stem_path in stem_paths.values():
+            info = sf.info(stem_path)
+            max_length = max(max_length, int(np.ceil(info.frames * self.sr / info.samplerate)))
+
+        # Acumular um stem por vez no buffer de saída (stems mais curtos = zeros no fim)
+        mixed = np.zeros(max_length, dtype=np.float32)
 
         for stem_name, stem_path in stem_paths.items():
-            y, sr = librosa.load(stem_path, sr=self.sr)
+            y, _ = self._load_audio(stem_path)
 
             # Aplicar ganho se especificado
             if stem_name in stem_gains:
                 gain_linear = 10 ** (stem_gains[stem_name] / 20)
-                y = y * gain_linear
-
-            stems_audio[stem_name] = y
-            max_length = max(max_length, len(y))
+                np.multiply(y, np.float32(gain_linear), out=y)
 
-        # Garantir que todos tenham o mesmo tamanho
-        for stem_name in stems_audio:
-            if len(stems_audio[stem_name]) < max_length:
-                stems_audio[stem_name] = np.pad(
-                    stems_audio[stem_name],
-                    (0, max_length - len(stems_audio[stem_name]))
-                )
-
-        # Somar todos os stems
-        mixed = np.sum(list(stems_audio.values()), axis=0)
+            n = min(len(y), max_length)
+            mixed[:n] += y[:n]
 
         # Normalizar para evitar clipping
         max_val = np.max(np.abs(mixed))
         if max_val > 0.95:
-            mixed = mixed * (0.95 / max_val)
+            np.multiply(mixed, np.float32(0.95 / max_val), out=mixed)
 
         # Salvar
         sf.write(output_path, mixed, self.sr)
@@ -487,13 +544,13 @@ class StemSeparator:
             Caminho do stem processado
         """
         # Carregar stem
-        y, sr = librosa.load(stem_path, sr=self.sr)
+        y, sr = self._load_audio(stem_path)
 
         # Processar
         y_processed = processing_func(y, sr, **kwargs)
 
         # Salvar
-        sf.write(output_path, y_processed, sr)
+        write_stem(output_path, y_processed, sr)
 
         return output_path
 
@@ -507,17 +564,22 @@ class StemSeparator:
         Returns:
             Dicionário com métricas de qualidade
         """
-        y, sr = librosa.load(stem_path, sr=self.sr)
+        y, sr = self._load_audio(stem_path)
+
+        # Pico e RMS por frame (mesmos frames do librosa.feature.rms) em uma passada
+        peak, rms, _ = fused_stats(y, 2048, 512, CLIP_THRESHOLD)
 
-        # Calcular métricas
-        rms = librosa.feature.rms(y=y)[0]
-        spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+        # Centroide espectral médio estimado em um trecho central de até 5s,
+        # em vez de uma STFT do stem inteiro só para obter uma média
+        excerpt_len = 5 * sr
+        start = max(0, (len(y) - excerpt_len) // 2)
+        spectral_centroid = librosa.feature.spectral_centroid(y=y[start:start + excerpt_len], sr=sr)[0]
 
         quality = {
             'rms_mean': float(np.mean(rms)),
             'rms_std': float(np.std(rms)),
             'spectral_centroid_mean': float(np.mean(spectral_centroid)),
-            'peak_amplitude': float(np.max(np.abs(y))),
+            'peak_amplitude': float(peak),
             'duration': len(y) / sr,
             'has_content': bool(np.mean(rms) > 0.001)  # Threshold para detectar se tem conteúdo
         }